@@ -28,7 +28,12 @@ import polars as pl
 
 import plotly.express as px
 
-from utils import add_daily_duration, add_wait_time_cols, add_job_duration_cols
+from utils import (
+    add_daily_duration,
+    add_wait_time_cols,
+    add_job_duration_cols,
+    scan_sacct_parquet,
+)
 from usage_report import generic_report
 
 
@@ -46,7 +51,10 @@ def compute_daily_metrics(
         Dictionnaire contenant les métriques calculées
     """
     # Ajouter CPUTime_seconds
-    lf = generic_report(lf)
+    # Seules les colonnes utilisées pour les métriques ci-dessous sont lues et aggrégées
+    lf = generic_report(
+        lf, columns=["Start", "End", "Submit", "State", "ElapsedRaw", "QOS"]
+    )
     # Ajouter deux colonnes: la date demandée (format pl.Date, colonne `date`), et la durée de chaque job pendant cette date (colonne `daily_duration_hours`)
     lf = add_daily_duration(lf, date)
 
@@ -85,24 +93,15 @@ def compute_daily_metrics(
         .max()
         .alias("Temps d'attente maximum en queue (secondes)"),
         pl.col("JobID")
-        .filter(
-            pl.col("Submit").str.to_datetime(strict=False).dt.date()
-            == pl.lit(date).str.to_date()
-        )
+        .filter(pl.col("Submit").dt.date() == pl.lit(date).str.to_date())
         .count()
         .alias("Jobs soumis"),
         pl.col("JobID")
-        .filter(
-            pl.col("Start").str.to_datetime(strict=False).dt.date()
-            == pl.lit(date).str.to_date()
-        )
+        .filter(pl.col("Start").dt.date() == pl.lit(date).str.to_date())
         .count()
         .alias("Jobs démarrés"),
         pl.col("JobID")
-        .filter(
-            pl.col("Start").str.to_datetime(strict=False).dt.date()
-            == pl.lit(date).str.to_date()
-        )
+        .filter(pl.col("Start").dt.date() == pl.lit(date).str.to_date())
         .count()
         .alias("Jobs terminés"),
         pl.col("JobID")
@@ -200,7 +199,7 @@ def generate_daily_report(
         print(f"Impossible de trouver {expected_file}", file=sys.stderr)
         sys.exit(1)
 
-    lf = pl.scan_parquet(expected_file)
+    lf = scan_sacct_parquet(expected_file)
 
     # Calculer les métriques
     cluster_capacity = cluster_capacity or {
@@ -281,7 +280,12 @@ def generate_daily_html_report(metrics: dict, date: str = None) -> str:
 
 
 def generate_aggregate_report(
-    from_date: str, to_date: str, database: Path, output: Path, no_js: bool = False
+    from_date: str,
+    to_date: str,
+    database: Path,
+    output: Path,
+    no_js: bool = False,
+    svg_calendars: bool = False,
 ):
     """
     Génère un rapport agrégé avec calendriers pour une période donnée.
@@ -337,6 +341,8 @@ def generate_aggregate_report(
         sys.exit(1)
 
     # Générer un calendrier pour chaque métrique
+    # Une seule figure matplotlib, réutilisée (axes vidés) d'un calendrier à l'autre
+    fig, ax = plt.subplots(figsize=(15, 6))
     calendars = []
     line_plots = []
     for metric_conf in metrics_config:
@@ -355,7 +361,7 @@ def generate_aggregate_report(
         ).with_columns(pl.col("Dates").str.to_date("%Y-%m-%d"))
 
         # Générer le calendrier avec matplotlib/dayplot
-        fig, ax = plt.subplots(figsize=(15, 6))
+        ax.clear()
         dp.calendar(
             dates=df_calendar["Dates"],
             values=df_calendar["Values"],
@@ -363,13 +369,17 @@ def generate_aggregate_report(
             ax=ax,
         )
 
-        # Convertir en base64 (pour avoir une image statique, compatible avec les clients mail)
         s = io.BytesIO()
-        fig.savefig(s, format="png", bbox_inches="tight")
-        plt.close(fig)
-        s.seek(0)
-        img_base64 = base64.b64encode(s.getvalue()).decode("utf-8")
-        calendar_html = f'<img src="data:image/png;base64,{img_base64}" />'
+        if svg_calendars:
+            # SVG intégré directement dans la page (image vectorielle), mais mal affiché par la plupart des clients mail
+            fig.savefig(s, format="svg", bbox_inches="tight")
+            svg = s.getvalue().decode("utf-8")
+            calendar_html = svg[svg.index("<svg") :]
+        else:
+            # Convertir en base64 (pour avoir une image statique, compatible avec les clients mail)
+            fig.savefig(s, format="png", bbox_inches="tight")
+            img_base64 = base64.b64encode(s.getvalue()).decode("utf-8")
+            calendar_html = f'<img src="data:image/png;base64,{img_base64}" />'
         calendars.append(
             {
                 "title": metric_title,
@@ -393,6 +403,8 @@ def generate_aggregate_report(
             }
         )
 
+    plt.close(fig)
+
     # Charger et rendre le template Jinja2
     env = j2.Environment(
         loader=j2.FileSystemLoader(os.path.join(os.path.dirname(__file__), "templates"))
@@ -489,6 +501,11 @@ Exemples:
         action="store_true",
         help="Générer des calendriers statiques sans JavaScript (images PNG). Utile pour les clients mail ne supportant pas le JS.",
     )
+    p_aggregate.add_argument(
+        "--svg-calendars",
+        action="store_true",
+        help="Intégrer les calendriers en SVG plutôt qu'en PNG encodé en base64. Déconseillé pour les rapports envoyés par mail.",
+    )
 
     return parser
 
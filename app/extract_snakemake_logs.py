@@ -9,6 +9,7 @@ Usage:
 Sortie: CSV avec colonnes slurm_jobid,input_size_bytes
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse, argcomplete
 import csv
@@ -83,30 +84,28 @@ def extract_from_record(record_lines):
     }
 
 
-def parse_log_file(log_path: Path, output_path: Path):
-    pwd = os.getcwd()
-    project_dir: Path = find_project_dir(log_path)
-    if project_dir is not None:
-        os.chdir(project_dir)
+def parse_log_file(log_path: Path) -> list[list]:
+    """Lignes du CSV de sortie (une par job SLURM) pour un fichier de log.
 
-    records_gen = snakemake_log_records_generator(log_path)
-    out_file = output_path.open("a", encoding="utf-8")
-
-    writer = csv.writer(out_file, delimiter="|")
+    Les chemins relatifs des fichiers d'entrée sont résolus depuis le dossier d'exécution de snakemake,
+    sans changer de dossier courant: plusieurs logs peuvent ainsi être traités en parallèle.
+    """
+    project_dir: Path = find_project_dir(log_path) or Path.cwd()
 
-    for record in records_gen:
+    rows = []
+    for record in snakemake_log_records_generator(log_path):
         parsed_record = extract_from_record(record)
         # This record is of no interest (either no lines returned or no job_id found)
         if not parsed_record or not parsed_record["job_id"]:
             continue
 
-        solved_inputs = [Path(p).absolute().resolve() for p in parsed_record["inputs"]]
+        solved_inputs = [(project_dir / p).resolve() for p in parsed_record["inputs"]]
         input_size_bytes = sum(p.stat().st_size for p in solved_inputs if p.exists())
 
         slurm_id = parsed_record["slurm_id"]
         rule_name = parsed_record["rule_name"]
         job_id = parsed_record["job_id"]
-        writer.writerow(
+        rows.append(
             [
                 slurm_id,
                 job_id,
@@ -116,7 +115,7 @@ def parse_log_file(log_path: Path, output_path: Path):
             ]
         )
 
-    os.chdir(pwd)
+    return rows
 
 
 def main():
@@ -160,6 +159,16 @@ def main():
                     print(line.strip()[14:])
                     break
 
+    # Les logs sont indépendants: ils sont analysés en parallèle, un processus par log.
+    # Avec un seul log (cas le plus courant), pas de pool de processus à démarrer
+    if len(log_paths) == 1:
+        rows_per_log = [parse_log_file(log_paths[0])]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(len(log_paths), os.cpu_count() or 1)
+        ) as executor:
+            rows_per_log = list(executor.map(parse_log_file, log_paths))
+
     with output_path.open("w", encoding="utf-8") as f:
         writer = csv.writer(
             f,
@@ -168,9 +177,8 @@ def main():
         writer.writerow(
             ["slurm_jobid", "job_id", "rule_name", "input_size_bytes", "inputs"]
         )
-
-    for log_path in log_paths:
-        parse_log_file(log_path, output_path)
+        for rows in rows_per_log:
+            writer.writerows(rows)
 
 
 if __name__ == "__main__":
@@ -1,27 +1,70 @@
 import polars as pl
 import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+COLORS = qualitative.Plotly
+
+
+# Quantile calculé comme par plotly.js (quartilemethod 'linear', fonction `interp`): interpolation linéaire
+# entre les valeurs triées, à la position p * N - 0.5 (bornée aux indices valides).
+# Diffère de l'interpolation 'linear' de Polars (position p * (N - 1)) pour les petits effectifs
+def plotly_quantile(values: pl.Expr, p: float) -> pl.Expr:
+    sorted_values = values.sort()
+    position = (p * values.len() - 0.5).clip(0, values.len() - 1)
+    fraction = position - position.floor()
+    lower_value = sorted_values.get(position.floor().cast(pl.UInt32))
+    upper_value = sorted_values.get(position.ceil().cast(pl.UInt32))
+    return (1 - fraction) * lower_value + fraction * upper_value
 
 
 def plot_snakemake_rule_efficicency(df: pl.DataFrame, column: str, title: str):
 
+    # Statistiques des boîtes (quartiles, moustaches et valeurs aberrantes) calculées par Polars,
+    # plutôt que d'envoyer toutes les valeurs à plotly pour qu'il les calcule dans le navigateur.
+    # Quartiles calculés comme plotly (voir plotly_quantile), et comme lui, les moustaches s'arrêtent
+    # aux valeurs les plus extrêmes à moins de 1.5 * IQR des quartiles
+    values = pl.col(column)
+    q1 = plotly_quantile(values, 0.25)
+    q3 = plotly_quantile(values, 0.75)
+    lower_bound = q1 - 1.5 * (q3 - q1)
+    upper_bound = q3 + 1.5 * (q3 - q1)
+    stats_df = (
+        df.lazy()
+        .filter(values.is_finite())
+        .group_by("rule_name")
+        .agg(
+            q1.alias("q1"),
+            values.median().alias("median"),
+            q3.alias("q3"),
+            values.filter(values >= lower_bound).min().alias("lowerfence"),
+            values.filter(values <= upper_bound).max().alias("upperfence"),
+            values.filter((values < lower_bound) | (values > upper_bound)).alias(
+                "outliers"
+            ),
+        )
+        .collect()
+    )
+    stats = {row["rule_name"]: row for row in stats_df.iter_rows(named=True)}
+
     rule_names = sorted(df["rule_name"].unique().to_list(), reverse=True)
 
     # Créer les boutons pour le dropdown
     buttons = []
 
     # Bouton "ALL" pour afficher toutes les règles (par défaut)
+    # Chaque règle a deux traces: la boîte et ses valeurs aberrantes
     buttons.append(
         {
             "label": "ALL",
             "method": "restyle",
-            "args": [{"visible": [True] * len(rule_names)}],
+            "args": [{"visible": [True] * 2 * len(rule_names)}],
         }
     )
 
     # Boutons pour chaque règle individuelle
     for i, rule_name in enumerate(rule_names):
-        visible = [False] * len(rule_names)
-        visible[i] = True
+        visible = [False] * 2 * len(rule_names)
+        visible[2 * i] = visible[2 * i + 1] = True
 
         buttons.append(
             {"label": rule_name, "method": "restyle", "args": [{"visible": visible}]}
@@ -30,16 +73,40 @@ def plot_snakemake_rule_efficicency(df: pl.DataFrame, column: str, title: str):
     # Créer des traces séparées pour chaque règle
     fig = go.Figure()
 
-    for rule_name in rule_names:
-        rule_data = df.filter(pl.col("rule_name") == rule_name)
+    for i, rule_name in enumerate(rule_names):
+        rule_stats = stats.get(rule_name)
+        # Même couleur pour la boîte et ses valeurs aberrantes
+        color = COLORS[i % len(COLORS)]
+
+        if rule_stats is None:
+            # Aucune valeur exploitable pour cette règle: boîte vide
+            fig.add_trace(
+                go.Box(x=[], y=[], name=rule_name, orientation="h", marker_color=color)
+            )
+            outliers = []
+        else:
+            fig.add_trace(
+                go.Box(
+                    q1=[rule_stats["q1"]],
+                    median=[rule_stats["median"]],
+                    q3=[rule_stats["q3"]],
+                    lowerfence=[rule_stats["lowerfence"]],
+                    upperfence=[rule_stats["upperfence"]],
+                    y=[rule_name],
+                    name=rule_name,
+                    orientation="h",
+                    marker_color=color,
+                )
+            )
+            outliers = rule_stats["outliers"]
 
         fig.add_trace(
-            go.Box(
-                x=rule_data[column].to_list(),
-                y=[rule_name] * len(rule_data),
+            go.Scatter(
+                x=outliers,
+                y=[rule_name] * len(outliers),
                 name=rule_name,
-                boxpoints="suspectedoutliers",
-                orientation="h",
+                mode="markers",
+                marker={"color": color},
             )
         )
 
@@ -0,0 +1,118 @@
+"""Unit tests for app/extract_snakemake_logs.py"""
+
+import csv
+import sys
+from pathlib import Path
+
+import pytest
+import extract_snakemake_logs
+from extract_snakemake_logs import parse_log_file
+
+
+def write_log(log_path: Path, run_id: str, jobs: list[tuple]):
+    """Write a minimal snakemake log: one record per (job_id, slurm_id, rule_name, inputs) tuple."""
+    lines = [f"SLURM run ID: {run_id}\n"]
+    for job_id, slurm_id, rule_name, inputs in jobs:
+        lines += [
+            "[Mon Feb 21 10:11:12 2026]\n",
+            f"rule {rule_name}:\n",
+            f"    input: {', '.join(inputs)}\n",
+            f"    jobid: {job_id}\n",
+            f"Job {job_id} has been submitted with SLURM jobid {slurm_id} (log: /tmp/{slurm_id}.log).\n",
+        ]
+    lines.append("[Mon Feb 21 10:11:13 2026]\n")
+    log_path.write_text("".join(lines))
+
+
+@pytest.fixture
+def workflow(tmp_path):
+    """Snakemake working directory with two input files and two logs in .snakemake/log."""
+    project_dir = tmp_path / "workflow"
+    (project_dir / "data").mkdir(parents=True)
+    (project_dir / "data" / "a.txt").write_text("abc")
+    (project_dir / "data" / "b.txt").write_text("abcde")
+    log_dir = project_dir / ".snakemake" / "log"
+    log_dir.mkdir(parents=True)
+
+    log_paths = [
+        log_dir / "2026-02-21T101112.1.snakemake.log",
+        log_dir / "2026-02-22T101112.1.snakemake.log",
+    ]
+    write_log(
+        log_paths[0],
+        "run-uuid-1",
+        [
+            ("1", "1001", "align", ["data/a.txt", "data/b.txt"]),
+            ("2", "1002", "merge", ["data/b.txt", "data/missing.txt"]),
+        ],
+    )
+    write_log(log_paths[1], "run-uuid-2", [("1", "2001", "align", ["data/a.txt"])])
+    return project_dir, log_paths
+
+
+def run_main(monkeypatch, log_paths, output_csv) -> list[list[str]]:
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "extract_snakemake_logs.py",
+            "-i",
+            *map(str, log_paths),
+            "-o",
+            str(output_csv),
+        ],
+    )
+    extract_snakemake_logs.main()
+    with output_csv.open() as f:
+        return list(csv.reader(f, delimiter="|"))
+
+
+class TestParseLogFile:
+    """Tests for the parse_log_file function."""
+
+    def test_inputs_resolved_from_project_dir(self, workflow, tmp_path, monkeypatch):
+        """Test: Relative inputs are resolved from the workflow dir, whatever the current dir."""
+        project_dir, log_paths = workflow
+        monkeypatch.chdir(tmp_path)
+
+        rows = parse_log_file(log_paths[0])
+
+        data_dir = project_dir / "data"
+        assert rows == [
+            ["1001", "1", "align", 8, f"{data_dir / 'a.txt'},{data_dir / 'b.txt'}"],
+            [
+                "1002",
+                "2",
+                "merge",
+                5,
+                f"{data_dir / 'b.txt'},{data_dir / 'missing.txt'}",
+            ],
+        ]
+        # Le dossier courant n'est pas modifié
+        assert Path.cwd() == tmp_path
+
+
+class TestMain:
+    """Tests for the command line entry point."""
+
+    def test_one_and_many_logs(self, workflow, tmp_path, monkeypatch, capsys):
+        """Test: Several logs (process pool) give the rows of each log (in process), in order."""
+        _, log_paths = workflow
+        monkeypatch.chdir(tmp_path)
+
+        single_rows = [
+            run_main(monkeypatch, [log_path], tmp_path / f"single-{i}.csv")
+            for i, log_path in enumerate(log_paths)
+        ]
+        many_rows = run_main(monkeypatch, log_paths, tmp_path / "many.csv")
+
+        header = ["slurm_jobid", "job_id", "rule_name", "input_size_bytes", "inputs"]
+        assert many_rows == [header, *single_rows[0][1:], *single_rows[1][1:]]
+        assert [row[0] for row in many_rows[1:]] == ["1001", "1002", "2001"]
+        # Les SLURM run IDs sont écrits sur la sortie standard, dans l'ordre des logs
+        assert capsys.readouterr().out.split() == [
+            "run-uuid-1",
+            "run-uuid-2",
+            "run-uuid-1",
+            "run-uuid-2",
+        ]
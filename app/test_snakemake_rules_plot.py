@@ -0,0 +1,59 @@
+"""Unit tests for the box statistics helpers in app/snakemake_rules_plot.py"""
+
+import polars as pl
+import pytest
+from snakemake_rules_plot import plotly_quantile
+
+
+class TestPlotlyQuantile:
+    """Tests for the plotly_quantile expression (plotly.js 'linear' quartiles, position p * N - 0.5)."""
+
+    @pytest.mark.parametrize(
+        "values, expected",
+        [
+            # (q1, median, q3)
+            ([5.0], (5.0, 5.0, 5.0)),
+            ([2.0, 1.0], (1.0, 1.5, 2.0)),
+            ([3.0, 1.0, 2.0], (1.25, 2.0, 2.75)),
+            ([4.0, 1.0, 3.0, 2.0], (1.5, 2.5, 3.5)),
+            ([1.0, 2.0, 3.0, 4.0, 5.0], (1.75, 3.0, 4.25)),
+        ],
+    )
+    def test_quartiles(self, values, expected):
+        """Test: q1, median and q3 match plotly for small odd and even counts."""
+        lf = pl.LazyFrame({"v": values})
+        result = lf.select(
+            plotly_quantile(pl.col("v"), p).alias(str(p)) for p in [0.25, 0.5, 0.75]
+        ).collect()
+
+        assert result.row(0) == pytest.approx(expected)
+
+    def test_clamped_positions(self):
+        """Test: Positions before the first or after the last value are clamped."""
+        lf = pl.LazyFrame({"v": [3.0, 1.0, 2.0]})
+        result = lf.select(
+            plotly_quantile(pl.col("v"), 0.0).alias("min"),
+            plotly_quantile(pl.col("v"), 0.1).alias("low"),
+            plotly_quantile(pl.col("v"), 0.9).alias("high"),
+            plotly_quantile(pl.col("v"), 1.0).alias("max"),
+        ).collect()
+
+        assert result.row(0) == pytest.approx((1.0, 1.0, 3.0, 3.0))
+
+    def test_per_group(self):
+        """Test: In a group_by, each rule gets the quartiles of its own values."""
+        lf = pl.LazyFrame(
+            {"rule_name": ["a", "b", "a", "b", "b"], "v": [1.0, 10.0, 2.0, 30.0, 20.0]}
+        )
+        result = (
+            lf.group_by("rule_name")
+            .agg(
+                plotly_quantile(pl.col("v"), 0.25).alias("q1"),
+                plotly_quantile(pl.col("v"), 0.75).alias("q3"),
+            )
+            .sort("rule_name")
+            .collect()
+        )
+
+        assert result["q1"].to_list() == pytest.approx([1.0, 12.5])
+        assert result["q3"].to_list() == pytest.approx([2.0, 27.5])
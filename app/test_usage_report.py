@@ -0,0 +1,307 @@
+"""Unit tests for the sacct parsing helpers in app/usage_report.py"""
+
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+import usage_report
+from usage_report import (
+    add_slurm_jobinfo_type_columns,
+    aggregate_per_alloc,
+    add_snakerule_col,
+    parse_total_cpu_col,
+    sacct_sanitizer,
+    save_to_parquet,
+)
+
+# Colonnes demandées à sacct par snakemake_post_run_report.py
+SACCT_FIELDS = [
+    "JobID",
+    "JobName",
+    "Comment",
+    "User",
+    "Account",
+    "Partition",
+    "QOS",
+    "State",
+    "ExitCode",
+    "Submit",
+    "Start",
+    "End",
+    "Elapsed",
+    "ElapsedRaw",
+    "CPUTime",
+    "CPUTimeRAW",
+    "TotalCPU",
+    "ReqCPUS",
+    "AllocCPUS",
+    "ReqMem",
+    "MaxRSS",
+    "MaxVMSize",
+    "NodeList",
+]
+
+
+def sacct_row(separator: str, **values) -> str:
+    """Build one sacct line over SACCT_FIELDS, empty for the columns not given."""
+    return separator.join(str(values.get(col, "")) for col in SACCT_FIELDS)
+
+
+def sacct_dump(separator: str, malformed: bool = True) -> str:
+    """Build a small sacct dump: two snakemake jobs (allocation, batch and extern lines),
+    optionally with lines broken by a separator inside Comment/JobName, and no final newline.
+    """
+    lines = [separator.join(SACCT_FIELDS)]
+    for i, job_id in enumerate(["1000", "1001"]):
+        times = dict(
+            Start="2026-02-24T10:00:00", End="2026-02-24T11:00:00", ElapsedRaw=3600
+        )
+        lines += [
+            sacct_row(
+                separator,
+                JobID=job_id,
+                JobName="run-uuid-1",
+                Comment=f"rule_align_wildcards_sample={i}",
+                User="bob",
+                State="COMPLETED",
+                Submit="2026-02-24T09:00:00",
+                ReqMem="8G",
+                AllocCPUS=4,
+                CPUTimeRAW=14400,
+                TotalCPU="01:30:00",
+                **times,
+            ),
+            sacct_row(
+                separator,
+                JobID=f"{job_id}.batch",
+                JobName="batch",
+                MaxRSS=f"{i + 1}G",
+                AllocCPUS=4,
+                CPUTimeRAW=14400,
+                TotalCPU="01:30:00",
+                **times,
+            ),
+            sacct_row(
+                separator,
+                JobID=f"{job_id}.extern",
+                JobName="extern",
+                MaxRSS="0",
+                **times,
+            ),
+        ]
+        if malformed and i == 0:
+            lines += [
+                sacct_row(separator, JobID="2000", Comment=f"a{separator}b"),
+                sacct_row(separator, JobID="2001", JobName=f"bad{separator}name"),
+            ]
+    return "\n".join(lines)
+
+
+class TestAddSlurmJobinfoTypeColumns:
+    """Tests for the add_slurm_jobinfo_type_columns function."""
+
+    def test_classification(self):
+        """Test: JobRoot and JobInfoType for each kind of sacct line."""
+        lf = pl.LazyFrame(
+            {
+                "JobID": [
+                    "12345",
+                    "12345.batch",
+                    "12345.extern",
+                    "12345.0",
+                    "12345.12",
+                    "12345.interactive",
+                ]
+            }
+        )
+        result = add_slurm_jobinfo_type_columns(lf).collect()
+
+        assert result["JobRoot"].to_list() == ["12345"] * 6
+        assert result["JobInfoType"].to_list() == [
+            "allocation",
+            "batch",
+            "extern",
+            "step",
+            "step",
+            "unknown",
+        ]
+
+    def test_array_job(self):
+        """Test: Array tasks keep their own JobRoot."""
+        lf = pl.LazyFrame({"JobID": ["12345_7", "12345_7.batch"]})
+        result = add_slurm_jobinfo_type_columns(lf).collect()
+
+        assert result["JobRoot"].to_list() == ["12345_7", "12345_7"]
+        assert result["JobInfoType"].to_list() == ["allocation", "batch"]
+
+
+class TestParseTotalCpuCol:
+    """Tests for the parse_total_cpu_col function."""
+
+    def test_formats(self):
+        """Test: Each TotalCPU format is converted to seconds, unreadable values to 0."""
+        lf = pl.LazyFrame(
+            {"TotalCPU": ["1-02:03:04", "02:03:04", "03:04.567", None, "garbage"]}
+        )
+        result = parse_total_cpu_col(lf).collect()
+
+        assert result["TotalCPU_seconds"].to_list() == [93784, 7384, 184, 0, 0]
+
+
+class TestAddSnakeruleCol:
+    """Tests for the add_snakerule_col function."""
+
+    def test_rule_and_wildcards(self):
+        """Test: rule_name and wildcards are read from the snakemake comment."""
+        lf = pl.LazyFrame(
+            {"Comment": ["rule_align_wildcards_sample=A", "rule_merge", "other", None]}
+        )
+        result = add_snakerule_col(lf).collect()
+
+        assert result["rule_name"].to_list() == ["align", "merge", None, None]
+        assert result["wildcards"].to_list() == ["sample=A", None, None, None]
+
+
+class TestAggregatePerAlloc:
+    """Tests for the aggregate_per_alloc function."""
+
+    def test_aggregation_by_type(self):
+        """Test: Numeric columns take the max, other types the first non-null value."""
+        lf = pl.LazyFrame(
+            {
+                "JobRoot": ["1", "1", "1"],
+                "MaxRSS": [None, 2, 5],
+                "AllocCPUS": pl.Series([4, 1, 1], dtype=pl.UInt32),
+                "JobName": [None, "batch", "step"],
+                "Reserved": [True, None, False],
+            }
+        )
+        result = aggregate_per_alloc(lf).collect()
+
+        assert result.row(0, named=True) == {
+            "JobRoot": "1",
+            "MaxRSS": 5,
+            "AllocCPUS": 4,
+            "JobName": "batch",
+            "Reserved": True,
+        }
+
+
+class TestSaveToParquet:
+    """Tests for the three ingestion paths of save_to_parquet."""
+
+    MALFORMED_JOB_IDS = ["2000", "2001"]
+
+    def convert(self, tmp_path, name, **kwargs) -> pl.DataFrame:
+        input_csv = tmp_path / "sacct.csv"
+        input_csv.write_text(sacct_dump("|"))
+        output_parquet = tmp_path / f"{name}.parquet"
+        save_to_parquet(input_csv, output_parquet, **kwargs)
+        return pl.read_parquet(output_parquet)
+
+    @pytest.mark.skipif(shutil.which("awk") is None, reason="awk is not installed")
+    def test_awk_and_python_sanitizers_agree(self, tmp_path, monkeypatch):
+        """Test: awk and the Python fallback drop the same lines and give the same frame."""
+        awk_df = self.convert(tmp_path, "awk", col_count=len(SACCT_FIELDS))
+        monkeypatch.setattr(usage_report.shutil, "which", lambda cmd: None)
+        python_df = self.convert(tmp_path, "python", col_count=len(SACCT_FIELDS))
+
+        assert_frame_equal(awk_df, python_df)
+        assert awk_df["JobID"].to_list() == [
+            "1000",
+            "1000.batch",
+            "1000.extern",
+            "1001",
+            "1001.batch",
+            "1001.extern",
+        ]
+        assert awk_df["MaxRSS"].to_list() == [None, 1024**3, 0, None, 2 * 1024**3, 0]
+        # Le fichier temporaire du sanitizer Python est supprimé
+        assert not (tmp_path / "python.tmp.csv").exists()
+
+    def test_no_sanitize_keeps_well_formed_lines(self, tmp_path, monkeypatch):
+        """Test: Without sanitizing, well-formed lines are read as by the sanitizers."""
+        monkeypatch.setattr(usage_report.shutil, "which", lambda cmd: None)
+        sanitized_df = self.convert(tmp_path, "python", col_count=len(SACCT_FIELDS))
+        raw_df = self.convert(tmp_path, "raw", sanitize=False)
+
+        # Les lignes malformées sont gardées (tronquées), les autres sont identiques
+        assert (
+            sorted(
+                raw_df.filter(pl.col("JobID").is_in(self.MALFORMED_JOB_IDS))["JobID"]
+            )
+            == self.MALFORMED_JOB_IDS
+        )
+        assert_frame_equal(
+            raw_df.filter(~pl.col("JobID").is_in(self.MALFORMED_JOB_IDS)),
+            sanitized_df,
+        )
+
+
+class TestSacctSanitizer:
+    """Tests for the sacct_sanitizer function (Python fallback of the awk sanitizer)."""
+
+    def test_chunk_boundaries(self, tmp_path):
+        """Test: The output does not depend on where chunks split the lines."""
+        input_csv = tmp_path / "sacct.csv"
+        input_csv.write_text(sacct_dump("|"))
+
+        outputs = []
+        for chunk_size in [1, 7, 64, 1 << 24]:
+            output_csv = tmp_path / f"sanitized-{chunk_size}.csv"
+            removed = sacct_sanitizer(
+                input_csv, output_csv, len(SACCT_FIELDS), "|", chunk_size
+            )
+            assert removed == 2
+            outputs.append(output_csv.read_bytes())
+
+        assert all(output == outputs[0] for output in outputs)
+        # Dernière ligne sans retour à la ligne final: recopiée telle quelle
+        last_line = sacct_dump("|").split("\n")[-1]
+        assert outputs[0].endswith(b"\n" + last_line.encode())
+
+
+class TestPipeline:
+    """Tests for the pipeline subcommand, as run by snakemake_post_run_report.py."""
+
+    def test_stdin_unit_separator(self, tmp_path):
+        """Test: A 23-column sacct dump delimited by \\x1f, read on stdin, gives the parquet and HTML reports."""
+        output_html = tmp_path / "report.html"
+        output_parquet = tmp_path / "report.parquet"
+        subprocess.run(
+            [
+                sys.executable,
+                Path(__file__).parent / "usage_report.py",
+                "pipeline",
+                "-i",
+                "-",
+                "--col-count",
+                str(len(SACCT_FIELDS)),
+                "--separator",
+                "\x1f",
+                "-o",
+                output_html,
+                "-n",
+                "run-uuid-1",
+                "--output-parquet",
+                output_parquet,
+            ],
+            # '|' n'est pas un séparateur ici: il peut apparaître dans un champ (ex: Comment).
+            # Les lignes coupées par un \x1f dans Comment/JobName sont supprimées
+            input=sacct_dump("\x1f").replace("sample=1", "sample=1|2").encode(),
+            check=True,
+        )
+
+        result = pl.read_parquet(output_parquet).sort("JobID")
+        assert result["JobID"].to_list() == ["1000", "1001"]
+        assert result["rule_name"].to_list() == ["align", "align"]
+        assert result["wildcards"].to_list() == ["sample=0", "sample=1|2"]
+        assert result["MaxRSS"].to_list() == [1024**3, 2 * 1024**3]
+        assert result["CPUEfficiencyPercent"].to_list() == pytest.approx([37.5, 37.5])
+        assert "align" in output_html.read_text()
+        # Le parquet intermédiaire (schéma sacct) est supprimé
+        assert not output_parquet.with_suffix(".raw.parquet").exists()
@@ -1,9 +1,13 @@
-"""Unit tests for add_daily_duration function in app/utils.py"""
+"""Unit tests for add_daily_duration and the sacct parsing helpers in app/utils.py"""
 
 import polars as pl
 from datetime import date
 import pytest
-from utils import add_daily_duration
+from utils import (
+    add_daily_duration,
+    parse_kmg_to_bytes,
+    parse_memory_cols,
+)
 
 
 def create_test_lazyframe(data: list[dict]) -> pl.LazyFrame:
@@ -191,3 +195,78 @@ class TestAddDailyDuration:
         result = add_daily_duration(lf, "2026-02-24").collect()
 
         assert result["daily_duration_hours"][0] == pytest.approx(0.5)
+
+    def test_preparsed_datetime_columns(self):
+        """Test: Start/End already stored as datetime (recent parquet files)."""
+        lf = create_test_lazyframe(
+            [
+                {
+                    "JobID": 1,
+                    "Start": "2026-02-23T22:00:00",
+                    "End": "2026-02-24T02:00:00",
+                },
+            ]
+        ).with_columns(pl.col("Start", "End").str.to_datetime())
+        result = add_daily_duration(lf, "2026-02-24").collect()
+
+        assert result["daily_duration_hours"][0] == pytest.approx(2.0)
+
+    def test_job_without_end(self):
+        """Test: Job still running (sacct reports End as 'Unknown')."""
+        lf = create_test_lazyframe(
+            [
+                {
+                    "JobID": 1,
+                    "Start": "2026-02-24T10:00:00",
+                    "End": "Unknown",
+                },
+            ]
+        )
+        result = add_daily_duration(lf, "2026-02-24").collect()
+
+        assert result["daily_duration_hours"][0] == pytest.approx(0.0)
+
+
+class TestParseKmg:
+    """Tests for the parse_kmg_to_bytes expression."""
+
+    def test_units(self):
+        """Test: Each sacct unit is converted to bytes, with or without the per-CPU/per-node suffix."""
+        lf = pl.LazyFrame(
+            {
+                "ReqMem": [
+                    "512K",
+                    "4000M",
+                    "8G",
+                    "1T",
+                    "1.5G",
+                    "0",
+                    "512",
+                    "4000Mc",
+                    "4000Mn",
+                    None,
+                ]
+            }
+        )
+        result = lf.select(parse_kmg_to_bytes("ReqMem")).collect()
+
+        assert result["ReqMem"].to_list() == [
+            512 * 1024,
+            4000 * 1024**2,
+            8 * 1024**3,
+            1024**4,
+            int(1.5 * 1024**3),
+            0,
+            512,
+            4000 * 1024**2,
+            4000 * 1024**2,
+            None,
+        ]
+
+    def test_memory_cols_parsed_once(self):
+        """Test: parse_memory_cols leaves already converted columns untouched."""
+        lf = pl.LazyFrame({"MaxRSS": ["2G"], "ReqMem": [8 * 1024**3]})
+        result = parse_memory_cols(lf).collect()
+
+        assert result["MaxRSS"].to_list() == [2 * 1024**3]
+        assert result["ReqMem"].to_list() == [8 * 1024**3]
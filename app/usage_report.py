@@ -2,6 +2,8 @@
 # PYTHON_ARGCOMPLETE_OK
 import argparse
 import os
+import shutil
+import subprocess
 import sys
 from functools import partial
 from pathlib import Path
@@ -11,27 +13,67 @@ import duckdb as db
 import jinja2 as j2
 import polars as pl
 from snakemake_rules_plot import plot_snakemake_rule_efficicency
-from utils import DEFAULT_CMAP, USEFUL_COLUMNS
-
+from utils import (
+    DEFAULT_CMAP,
+    MEMORY_COLUMNS,
+    SACCT_SCHEMA,
+    USEFUL_COLUMNS,
+    parse_datetime_cols,
+    parse_memory_cols,
+    scan_sacct_parquet,
+)
 
 # Première étape: rendre le fichier d'accounting sain
+# Equivalent de sacct_sanitizer en awk: garde les lignes à `col_count` colonnes, et écrit dans stderr le nombre de lignes supprimées
+AWK_SANITIZER = 'NF == col_count { print; next } { removed++ } END { print removed + 0 > "/dev/stderr" }'
+
+
+# Version Python, utilisée si awk n'est pas disponible
 def sacct_sanitizer(
-    input_filename: Path, output_filename: Path, col_count=109, separator="|"
+    input_filename: Path,
+    output_filename: Path,
+    col_count=109,
+    separator="|",
+    chunk_size=1 << 24,
 ) -> int:
     """Removes any line in `filename` with more than `col_count` columns, using `separator`.
     This means, `separator` has to be found exactly `col_count - 1` times in each line
+    The file is read in binary chunks of `chunk_size` bytes, so that separators are counted by bytes.count
+    (no decoding, no per-line file iteration)
     Returns the number of lines that were removed
     """
+    separator = separator.encode()
     lines_removed = 0
-    with open(input_filename, "r") as fi, open(output_filename, "w") as fo:
-        for line in fi:
-            if line.count(separator) != col_count - 1:
+    # Dernière ligne (incomplète) du bloc précédent
+    tail = b""
+    # Les blocs lus étant déjà gros, la lecture se fait sans tampon intermédiaire (buffering=0)
+    with open(input_filename, "rb", buffering=0) as fi, open(
+        output_filename, "wb"
+    ) as fo:
+        while chunk := fi.read(chunk_size):
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            kept_lines = [
+                line for line in lines if line.count(separator) == col_count - 1
+            ]
+            lines_removed += len(lines) - len(kept_lines)
+            if kept_lines:
+                fo.write(b"\n".join(kept_lines) + b"\n")
+        # Dernière ligne du fichier, sans retour à la ligne final
+        if tail:
+            if tail.count(separator) == col_count - 1:
+                fo.write(tail)
+            else:
                 lines_removed += 1
-                continue
-            fo.write(line)
     return lines_removed
 
 
+# Valeurs possibles de JobInfoType (stockées comme un Enum plutôt que comme du texte)
+JOB_INFO_TYPES = pl.Enum(["allocation", "batch", "extern", "step", "unknown"])
+# JobInfoType associé à chaque suffixe de JobID connu (les steps, numérotés, sont traités à part)
+JOB_SUFFIX_TYPES = {"": "allocation", "batch": "batch", "extern": "extern"}
+
+
 # Essentiel ! Ajoute JobRoot et JobInfoType (utile par la suite!)
 def add_slurm_jobinfo_type_columns(lf: pl.LazyFrame) -> pl.LazyFrame:
     """
@@ -40,105 +82,83 @@ def add_slurm_jobinfo_type_columns(lf: pl.LazyFrame) -> pl.LazyFrame:
       - JobInfoType: allocation | batch | extern | step | unknown
 
     Classification basée sur le suffixe du JobID:
-      12345        -> allocation
-      12345.batch  -> batch
-      12345.extern -> extern
-      12345.0      -> step
-      12345.1      -> step
+      12345          -> allocation
+      12345.batch    -> batch
+      12345.extern   -> extern
+      12345.0        -> step
+      12345.1        -> step
+      12345_7.batch  -> batch (JobRoot: 12345_7, tâche d'un job array)
     """
 
+    # Position du premier '.' (nulle pour les allocations): découpage positionnel,
+    # sans expression régulière ni struct intermédiaire
+    dot = pl.col("JobID").str.find(".", literal=True)
+    # Suffixes littéraux, classés par une simple table de correspondance.
+    # Les allocations (sans suffixe) y sont représentées par un suffixe vide: un JobID ne se termine jamais par '.'
+    known_suffix_type = (
+        pl.col("_JobSuffix")
+        .fill_null("")
+        .replace_strict(JOB_SUFFIX_TYPES, default=None, return_dtype=pl.String)
+    )
+
     return (
         lf.with_columns(
-            pl.col("JobID")
-            .str.extract_groups(r"^(?<JobRoot>\d+)(?<_JobSuffix>\..+)?")
-            .struct.unnest()
+            # Sans '.', la longueur est nulle: le JobID entier est conservé
+            pl.col("JobID").str.slice(0, dot).alias("JobRoot"),
+            pl.col("JobID").str.slice(dot + 1).alias("_JobSuffix"),
         )
         .with_columns(
-            pl.when(pl.col("_JobSuffix").is_null())
-            .then(pl.lit("allocation"))
-            .when(pl.col("_JobSuffix") == ".batch")
-            .then(pl.lit("batch"))
-            .when(pl.col("_JobSuffix") == ".extern")
-            .then(pl.lit("extern"))
+            pl.when(known_suffix_type.is_not_null())
+            .then(known_suffix_type)
             # suffixe numérique → step srun
-            .when(pl.col("_JobSuffix").str.contains(r"^\.\d+$"))
+            .when(pl.col("_JobSuffix").cast(pl.Int64, strict=False).is_not_null())
             .then(pl.lit("step"))
             .otherwise(pl.lit("unknown"))
+            .cast(JOB_INFO_TYPES)
             .alias("JobInfoType"),
         )
         .drop("_JobSuffix")
     )
 
 
-# Ajoute une colonne avec le même nom que colname, mais avec le suffixe `_unit`
-def add_units_kmg(lf: pl.LazyFrame, colname: str) -> pl.LazyFrame:
-    return lf.with_columns(
-        pl.col(colname)
-        .str.extract_groups(rf"(?<{colname}>\d+)(?<{colname}_unit>[KMGT])")
-        .struct.unnest()
-    )
-
-
-# Convertit la colonne `colname` dans sa valeur équivalente en bytes (nécessite une colonne `{colname}_unit` existante, contenant K, M ou G en majuscules)
-# Cette fonction supprime la colonne _unit associée (qui n'est plus vraiment nécessaire)
-def convert_kmg_col(lf: pl.LazyFrame, colname: str) -> pl.LazyFrame:
-    return lf.with_columns(
-        pl.when(pl.col(colname).is_null())
-        .then(None)
-        .when(pl.col(f"{colname}_unit") == "K")
-        .then(pl.col(colname).cast(pl.Int64) * 1024)
-        .when(pl.col(f"{colname}_unit") == "M")
-        .then(pl.col(colname).cast(pl.Int64) * 1024**2)
-        .when(pl.col(f"{colname}_unit") == "G")
-        .then(pl.col(colname).cast(pl.Int64) * 1024**3)
-        .otherwise(None)
-        .alias(colname)
-    ).drop(f"{colname}_unit")
-
-
-def col_to_gigabytes(
-    lf: pl.LazyFrame, colname: str, keep_original=False
+# `schema` permet de réutiliser un schéma déjà résolu par l'appelant, plutôt que de le recalculer ici
+def aggregate_per_alloc(
+    lf: pl.LazyFrame,
+    group_col="JobRoot",
+    schema: dict[str, pl.DataType] | None = None,
 ) -> pl.LazyFrame:
-    return lf.with_columns(
-        (pl.col(colname) / 2**30).alias(f"{colname}_G" if keep_original else colname)
-    )
+    if schema is None:
+        schema = lf.collect_schema()
 
+    # Colonnes numériques: valeur maximale parmi les lignes de l'allocation (ex: MaxRSS des steps)
+    # Autres types (texte, dates, catégories...): première valeur non nulle
+    aggregations = [
+        (
+            pl.col(col_name).max()
+            if col_type.is_numeric()
+            else pl.col(col_name).first(ignore_nulls=True)
+        )
+        for col_name, col_type in schema.items()
+        if col_name != group_col
+    ]
 
-def aggregate_per_alloc(lf: pl.LazyFrame, group_col="JobRoot") -> pl.LazyFrame:
+    # L'ordre des groupes n'a pas d'importance ici: Polars peut répartir l'agrégation librement entre ses threads
+    return lf.group_by(group_col, maintain_order=False).agg(aggregations)
 
-    aggregate_behavior = lambda col_name, col_type: {
-        pl.Int64: pl.col(col_name).max().alias(col_name),
-        pl.Float64: pl.col(col_name).max().alias(col_name),
-        pl.String: pl.col(col_name).drop_nulls().first().alias(col_name),
-    }[col_type]
 
-    return lf.group_by(group_col).agg(
-        [
-            aggregate_behavior(col_name, col_type)
-            for col_name, col_type in lf.collect_schema().items()
-            if col_name != group_col
-        ]
-    )
+# Expressions régulières partagées, définies une seule fois au niveau du module
+# Commentaire posé par snakemake sur ses jobs: rule_<rule_name>[_wildcards_<wildcards>]
+SNAKERULE_COMMENT_RE = r"^rule_(?<rule_name>.+?)(?:_wildcards_(?<wildcards>.+))?$"
+# TotalCPU, sous l'une des formes JJ-HH:MM:SS, HH:MM:SS ou MM:SS.ms
+TOTAL_CPU_RE = (
+    r"^(?:(?:(?<days>\d+)-)?(?<hours>\d+):)?(?<minutes>\d+):(?<seconds>\d+)(?:\.\d+)?$"
+)
 
 
 def add_snakerule_col(lf: pl.LazyFrame) -> pl.LazyFrame:
+    # Une seule expression régulière, le groupe `wildcards` étant optionnel
     lf = lf.with_columns(
-        pl.when(pl.col("Comment").str.contains(r"^rule_.+?_wildcards_.+"))
-        .then(
-            pl.col("Comment")
-            .str.extract_groups(r"^rule_(?<rule_name>.+?)_wildcards_(?<wildcards>.+)")
-            .struct.unnest()
-        )
-        .when(pl.col("Comment").str.contains(r"^rule_.+?"))
-        .then(
-            pl.col("Comment")
-            .str.extract_groups(r"^rule_(?<rule_name>.+)$")
-            .struct.with_fields(pl.lit(None).alias("wildcards"))
-            .struct.unnest(),
-        )
-        .otherwise(
-            pl.struct(rule_name=pl.lit(None), wildcards=pl.lit(None)).struct.unnest()
-        )
+        pl.col("Comment").str.extract_groups(SNAKERULE_COMMENT_RE).struct.unnest()
     )
     return lf
 
@@ -185,9 +205,9 @@ def aggregate_per_snakemake_rule(lf: pl.LazyFrame, input_sizes: bool) -> pl.Lazy
         pl.col("Elapsed").min().alias("Elapsed_min"),
         # Durée d'exécution maximale
         pl.col("Elapsed").max().alias("Elapsed_max"),
-        pl.col("QOS").drop_nulls().first(),
-        pl.col("Account").drop_nulls().first(),
-        pl.col("NodeList").drop_nulls().first(),
+        pl.col("QOS").first(ignore_nulls=True),
+        pl.col("Account").first(ignore_nulls=True),
+        pl.col("NodeList").first(ignore_nulls=True),
     )
 
     return lf
@@ -197,91 +217,71 @@ def parse_total_cpu_col(lf: pl.LazyFrame) -> pl.LazyFrame:
     # Calcul de l'efficacité CPU: TotalCPU / (ElapsedRaw * AllocCPUS) * 100
     # TotalCPU est le temps CPU (utilisateur + système) en secondes
     # Formats possibles: HH:MM:SS, MM:SS.ms, JJ-HH:MM:SS
+    # Les trois formats sont lus par une seule expression régulière (TOTAL_CPU_RE),
+    # les parties absentes (ou une valeur illisible) comptant pour 0
 
+    total_cpu_parsed = pl.col("TotalCPU").str.extract_groups(TOTAL_CPU_RE)
     lf = lf.with_columns(
-        pl.when(pl.col("TotalCPU").str.contains(r"^\d+-\d+:\d+:\d+$"))
-        .then(
-            pl.col("TotalCPU")
-            .str.extract_groups(
-                r"(?<days>\d+)-(?<hours>\d+):(?<minutes>\d+):(?<seconds>\d+)"
+        pl.sum_horizontal(
+            total_cpu_parsed.struct.field(field).cast(pl.Int64).fill_null(0) * factor
+            for field, factor in (
+                ("days", 86400),
+                ("hours", 3600),
+                ("minutes", 60),
+                ("seconds", 1),
             )
-            .alias("TotalCPU_Parsed")
-        )
-        .when(pl.col("TotalCPU").str.contains(r"^\d+:\d+:\d+$"))
-        .then(
-            pl.col("TotalCPU")
-            .str.extract_groups(r"(?<hours>\d+):(?<minutes>\d+):(?<seconds>\d+)")
-            .struct.with_fields(pl.lit(0).alias("days"))
-            .alias("TotalCPU_Parsed")
-        )
-        .when(pl.col("TotalCPU").str.contains(r"^\d+:\d+\.\d+$"))
-        .then(
-            pl.col("TotalCPU")
-            .str.extract_groups(r"(?<minutes>\d+):(?<seconds>\d+)")
-            .struct.with_fields(pl.lit(0).alias("days"), pl.lit(0).alias("hours"))
-            .alias("TotalCPU_Parsed")
-        )
-        .otherwise(
-            pl.struct(
-                days=pl.lit(0), hours=pl.lit(0), minutes=pl.lit(0), seconds=pl.lit(0)
-            ).alias("TotalCPU_Parsed")
-        )
+        ).alias("TotalCPU_seconds")
     )
 
-    lf = lf.with_columns(
-        pl.col("TotalCPU_Parsed")
-        .struct.with_fields(
-            (
-                pl.col("TotalCPU_Parsed").struct.field("days").cast(pl.Int64) * 86400
-                + pl.col("TotalCPU_Parsed").struct.field("hours").cast(pl.Int64) * 3600
-                + pl.col("TotalCPU_Parsed").struct.field("minutes").cast(pl.Int64) * 60
-                + pl.col("TotalCPU_Parsed").struct.field("seconds").cast(pl.Int64)
-            ).alias("TotalCPU_seconds")
-        )
-        .struct.field("TotalCPU_seconds")
-    ).drop("TotalCPU_Parsed")
-
     return lf
 
 
+# Colonnes nécessaires au calcul des métriques de generic_report
+GENERIC_REPORT_COLUMNS = ["JobID", "MaxRSS", "ReqMem", "TotalCPU", "CPUTimeRAW"]
+
+
 # A appeler depuis une fonction qui a pris un ou plusieurs parquets en entrée.
 # Génère un lazyframe avec les colonnes les plus intéressantes pour avoir une idée générale de la consommation de mémoire notamment
-def generic_report(lf: pl.LazyFrame) -> pl.LazyFrame:
+def generic_report(lf: pl.LazyFrame, columns: list[str] | None = None) -> pl.LazyFrame:
     """
     Un simple rapport qui, à partir d'un lazyframe, résume les ressources utilisées
     Répond à la question: pour chaque job, combien de pourcent de ce qui avait été demandé a réellement été utilisé
+    Si `columns` est précisé, seules ces colonnes (en plus de GENERIC_REPORT_COLUMNS) sont lues et aggrégées
     """
 
+    if columns is not None:
+        # dict.fromkeys: retire les doublons en gardant l'ordre
+        lf = lf.select(list(dict.fromkeys([*GENERIC_REPORT_COLUMNS, *columns])))
+
     # Ajouter les colonnes JobRoot et JobInfoType (utile pour la suite)
     lf = add_slurm_jobinfo_type_columns(lf)
     # Aggrège les métriques
 
-    lf = add_units_kmg(lf, "MaxRSS")
-    lf = convert_kmg_col(lf, "MaxRSS")
-    lf = col_to_gigabytes(lf, "MaxRSS", keep_original=True)
+    # Conversion des colonnes mémoire en bytes (déjà faite à l'écriture des parquets récents),
+    # et en Go dans les colonnes `_G`
+    lf = parse_memory_cols(lf).with_columns(
+        (pl.col(col_name) / 2**30).alias(f"{col_name}_G") for col_name in MEMORY_COLUMNS
+    )
 
-    lf = add_units_kmg(lf, "ReqMem")
-    lf = convert_kmg_col(lf, "ReqMem")
-    lf = col_to_gigabytes(lf, "ReqMem", keep_original=True)
+    # Schéma résolu une seule fois, puis transmis à l'agrégation
+    schema = lf.collect_schema()
 
     # Attention: tous les champs aggrégés le seront uniquement s'ils sont de type numérique
-    lf = aggregate_per_alloc(lf)
-    lf = lf.with_columns(
-        pl.col("MaxRSS").truediv(pl.col("ReqMem")).alias("MemEfficiencyRatio")
-    )
-    lf = lf.with_columns(
-        pl.col("MemEfficiencyRatio").mul(100).alias("MemEfficiencyPercent")
-    )
+    lf = aggregate_per_alloc(lf, schema=schema)
 
     lf = parse_total_cpu_col(lf)
 
+    # Métriques d'efficacité, calculées en une seule étape
+    mem_efficiency_ratio = pl.col("MaxRSS").truediv(pl.col("ReqMem"))
     lf = lf.with_columns(
+        mem_efficiency_ratio.alias("MemEfficiencyRatio"),
+        mem_efficiency_ratio.mul(100).alias("MemEfficiencyPercent"),
         (
             pl.col("TotalCPU_seconds")
             .truediv(pl.col("CPUTimeRAW"))
             .fill_nan(0)
             .mul(100)
-        ).alias("CPUEfficiencyPercent")
+        ).alias("CPUEfficiencyPercent"),
     )
 
     return lf
@@ -294,140 +294,105 @@ def save_to_parquet(
     verbose: bool = False,
     col_count: int = 109,
     separator: str = "|",
+    sanitize: bool = True,
 ):
-    sacct_file_overwrite = input_csv.with_suffix(".tmp.csv")
-    removed_lines = sacct_sanitizer(
-        input_csv, sacct_file_overwrite, col_count, separator
-    )
-    sacct_file_overwrite.replace(input_csv)
+    # "-": la sortie de sacct est lue sur l'entrée standard, sans fichier CSV intermédiaire
+    # Dans tous les cas, SACCT_SCHEMA couvre toutes les colonnes: pas d'inférence de types (infer_schema_length=0)
+    from_stdin = str(input_csv) == "-"
+    # Nombre de lignes supprimées, inconnu sans étape de nettoyage
+    removed_lines = None
+    # CSV nettoyé par la version Python du sanitizer, supprimé après conversion
+    sanitized_csv = None
+    if not sanitize:
+        # Une seule passe, entièrement dans le lecteur CSV (multithreadé) de Polars.
+        # Attention: les lignes malformées ne sont pas supprimées, mais tronquées (ou complétées par des nulls),
+        # et les valeurs qui ne correspondent pas au schéma deviennent nulles
+        lf = pl.scan_csv(
+            sys.stdin.buffer if from_stdin else input_csv,
+            separator=separator,
+            schema_overrides=SACCT_SCHEMA,
+            infer_schema_length=0,
+            quote_char=None,
+            truncate_ragged_lines=True,
+            ignore_errors=True,
+        )
+    elif shutil.which("awk"):
+        # awk filtre les lignes malformées et alimente directement Polars par un pipe:
+        # pas de fichier temporaire, et le filtrage tourne en parallèle de la lecture du CSV
+        # (awk lit lui-même l'entrée standard quand le fichier est "-")
+        awk = subprocess.Popen(
+            [
+                "awk",
+                "-F",
+                separator,
+                "-v",
+                f"col_count={col_count}",
+                AWK_SANITIZER,
+                str(input_csv),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        lf = pl.read_csv(
+            awk.stdout,
+            separator=separator,
+            schema_overrides=SACCT_SCHEMA,
+            infer_schema_length=0,
+            quote_char=None,
+        ).lazy()
+        _, awk_stderr = awk.communicate()
+        if awk.returncode != 0:
+            raise subprocess.CalledProcessError(
+                awk.returncode, awk.args, stderr=awk_stderr
+            )
+        removed_lines = int(awk_stderr)
+    else:
+        # Le fichier d'entrée n'est pas modifié: le CSV nettoyé est écrit à côté du parquet de sortie
+        sanitized_csv = output_parquet.with_suffix(".tmp.csv")
+        removed_lines = sacct_sanitizer(
+            Path("/dev/stdin") if from_stdin else input_csv,
+            sanitized_csv,
+            col_count,
+            separator,
+        )
+
+        lf = pl.scan_csv(
+            sanitized_csv,
+            separator=separator,
+            schema_overrides=SACCT_SCHEMA,
+            infer_schema_length=0,
+            quote_char=None,
+        )
 
-    if verbose:
+    if verbose and removed_lines is not None:
         sys.stderr.write(
             f"{removed_lines} lignes ont été supprimées du fichier d'accounting"
         )
 
-    pl.scan_csv(
-        input_csv,
-        separator="|",
-        schema_overrides={
-            "Account": pl.String,
-            "AdminComment": pl.String,
-            "AllocCPUS": pl.Int64,
-            "AllocNodes": pl.Int64,
-            "AllocTRES": pl.String,
-            "AssocID": pl.Int64,
-            "AveCPU": pl.String,
-            "AveCPUFreq": pl.String,
-            "AveDiskRead": pl.String,
-            "AveDiskWrite": pl.String,
-            "AvePages": pl.Int64,
-            "AveRSS": pl.String,
-            "AveVMSize": pl.String,
-            "BlockID": pl.String,
-            "Cluster": pl.String,
-            "Comment": pl.String,
-            "Constraints": pl.String,
-            "ConsumedEnergy": pl.Int64,
-            "ConsumedEnergyRaw": pl.Int64,
-            "Container": pl.String,
-            "CPUTime": pl.String,
-            "CPUTimeRAW": pl.Int64,
-            "DBIndex": pl.Int64,
-            "DerivedExitCode": pl.String,
-            "Elapsed": pl.String,
-            "ElapsedRaw": pl.Int64,
-            "Eligible": pl.String,
-            "End": pl.String,
-            "ExitCode": pl.String,
-            "Flags": pl.String,
-            "GID": pl.Int64,
-            "Group": pl.String,
-            "JobID": pl.String,
-            "JobIDRaw": pl.String,
-            "JobName": pl.String,
-            "Layout": pl.String,
-            "MaxDiskRead": pl.String,
-            "MaxDiskReadNode": pl.String,
-            "MaxDiskReadTask": pl.Int64,
-            "MaxDiskWrite": pl.String,
-            "MaxDiskWriteNode": pl.String,
-            "MaxDiskWriteTask": pl.Int64,
-            "MaxPages": pl.Int64,
-            "MaxPagesNode": pl.String,
-            "MaxPagesTask": pl.Int64,
-            "MaxRSS": pl.String,
-            "MaxRSSNode": pl.String,
-            "MaxRSSTask": pl.Int64,
-            "MaxVMSize": pl.String,
-            "MaxVMSizeNode": pl.String,
-            "MaxVMSizeTask": pl.Int64,
-            "McsLabel": pl.String,
-            "MinCPU": pl.String,
-            "MinCPUNode": pl.String,
-            "MinCPUTask": pl.Int64,
-            "NCPUS": pl.Int64,
-            "NNodes": pl.Int64,
-            "NodeList": pl.String,
-            "NTasks": pl.Int64,
-            "Partition": pl.String,
-            "Priority": pl.Int64,
-            "QOS": pl.String,
-            "QOSRAW": pl.Int64,
-            "Reason": pl.String,
-            "ReqCPUFreq": pl.String,
-            "ReqCPUFreqGov": pl.String,
-            "ReqCPUFreqMax": pl.String,
-            "ReqCPUFreqMin": pl.String,
-            "ReqCPUS": pl.Int64,
-            "ReqMem": pl.String,
-            "ReqNodes": pl.Int64,
-            "ReqTRES": pl.String,
-            "Reservation": pl.String,
-            "ReservationId": pl.String,
-            "Reserved": pl.String,
-            "ResvCPU": pl.String,
-            "ResvCPURAW": pl.Int64,
-            "Start": pl.String,
-            "State": pl.String,
-            "Submit": pl.String,
-            "SubmitLine": pl.String,
-            "Suspended": pl.String,
-            "SystemComment": pl.String,
-            "SystemCPU": pl.String,
-            "Timelimit": pl.String,
-            "TimelimitRaw": pl.String,
-            "TotalCPU": pl.String,
-            "TRESUsageInAve": pl.String,
-            "TRESUsageInMax": pl.String,
-            "TRESUsageInMaxNode": pl.String,
-            "TRESUsageInMaxTask": pl.String,
-            "TRESUsageInMin": pl.String,
-            "TRESUsageInMinNode": pl.String,
-            "TRESUsageInMinTask": pl.String,
-            "TRESUsageInTot": pl.String,
-            "TRESUsageOutAve": pl.String,
-            "TRESUsageOutMax": pl.String,
-            "TRESUsageOutMaxNode": pl.String,
-            "TRESUsageOutMaxTask": pl.String,
-            "TRESUsageOutMin": pl.String,
-            "TRESUsageOutMinNode": pl.String,
-            "TRESUsageOutMinTask": pl.String,
-            "TRESUsageOutTot": pl.String,
-            "UID": pl.Int64,
-            "User": pl.String,
-            "UserCPU": pl.String,
-            "WCKey": pl.String,
-            "WCKeyID": pl.Int64,
-            "WorkDir": pl.String,
-        },
-        quote_char=None,
-    ).sink_parquet(output_parquet)
+    # Les dates et les colonnes mémoire sont converties une seule fois ici, plutôt qu'à chaque lecture du parquet
+    # Trier par Start resserre les statistiques min/max de chaque row group sur les colonnes de dates,
+    # ce qui permet aux lectures filtrées par période d'ignorer des row groups entiers.
+    # Des row groups plus petits rendent ce filtrage plus fin, sans pénaliser les agrégations.
+    # Le tri est stable: à Start égal, l'allocation reste avant ses steps batch/extern (comme dans la sortie de sacct),
+    # ce dont dépendent les agrégations qui gardent la première valeur non nulle (ex: JobName)
+    parse_memory_cols(parse_datetime_cols(lf)).sort(
+        "Start", maintain_order=True
+    ).sink_parquet(
+        output_parquet,
+        compression="zstd",
+        compression_level=3,
+        statistics=True,
+        row_group_size=64_000,
+    )
+
+    if sanitized_csv is not None:
+        sanitized_csv.unlink()
 
 
 # Fonctions utilitaires CLI
 def generic_usage_excel(input_parquet: Path, output_excel: Path):
-    lf = pl.scan_parquet(input_parquet)
-    lf = generic_report(lf)
+    lf = scan_sacct_parquet(input_parquet)
+    lf = generic_report(lf, columns=USEFUL_COLUMNS)
     lf = lf.select(
         *[
             *USEFUL_COLUMNS,
@@ -437,7 +402,9 @@ def generic_usage_excel(input_parquet: Path, output_excel: Path):
             "CPUEfficiencyPercent",
         ]
     )
-    lf.collect().write_excel(output_excel)
+    # Moteur streaming: l'agrégation et la projection sont exécutées par morceaux,
+    # seul le résultat (une ligne par allocation) est matérialisé avant l'écriture de l'Excel
+    lf.collect(engine="streaming").write_excel(output_excel)
 
 
 def add_metrics_relative_to_input_size(
@@ -479,7 +446,14 @@ def generate_snakemake_efficiency_report(
     input_sizes_csv: Path = None,
 ):
 
-    lf = pl.scan_parquet(input_parquets)
+    lf = add_slurm_jobinfo_type_columns(scan_sacct_parquet(input_parquets))
+
+    # Sélection des allocations des jobs demandés avant l'agrégation (semi-jointure sur JobRoot):
+    # seules leurs lignes (allocation et steps) sont aggrégées, et non toute la base SACCT
+    selected_jobs = lf.filter(pl.col("JobName").str.contains_any(job_names)).select(
+        "JobRoot"
+    )
+    lf = lf.join(selected_jobs, on="JobRoot", how="semi").drop("JobRoot", "JobInfoType")
 
     lf = generic_report(lf)
     lf = lf.filter(pl.col("JobName").str.contains_any(job_names))
@@ -497,15 +471,26 @@ def generate_snakemake_efficiency_report(
         )
         # Intermediate parquet ne sert plus
         intermediate_parquet.unlink()
-        lf = pl.scan_parquet(augmented_parquet)
     else:
         if output_parquet:
             augmented_parquet = output_parquet
         else:
             augmented_parquet = output_html.with_suffix(".tmp.parquet")
+        lf.sink_parquet(augmented_parquet)
+
+    # Les données des jobs sélectionnés sont calculées une seule fois (ci-dessus), puis relues depuis ce parquet:
+    # les graphiques et les tableaux ne relancent pas la lecture et l'agrégation de toute la base SACCT
+    lf = pl.scan_parquet(augmented_parquet)
 
     # Réaliser ici toutes les opérations qui nécessitent le dataframe complet (relâché)
-    relaxed_df = lf.collect()
+    # Seules les colonnes affichées dans les graphiques sont lues
+    relaxed_df = lf.select(
+        "rule_name",
+        "MemEfficiencyPercent",
+        "CPUEfficiencyPercent",
+        "ElapsedRaw",
+        *(["UsedRAMPerMo", "MinPerMo"] if input_sizes_csv else []),
+    ).collect()
 
     mem_box_plot = plot_snakemake_rule_efficicency(
         relaxed_df, "MemEfficiencyPercent", "Efficacité mémoire (%)"
@@ -535,7 +520,8 @@ def generate_snakemake_efficiency_report(
 
     # A partir d'ici, toutes les opérations ont lieu sur un lazyframe aggrégé (groupé par règle, très peu de colonnes)
 
-    lf = aggregate_per_snakemake_rule(lf, bool(input_sizes_csv))
+    # Agrégation calculée une seule fois, les tableaux ci-dessous en sélectionnant chacun quelques colonnes
+    lf = aggregate_per_snakemake_rule(lf, bool(input_sizes_csv)).collect().lazy()
 
     efficiency_table_mem = (
         lf.select(
@@ -705,6 +691,32 @@ def generate_snakemake_efficiency_report(
         augmented_parquet.replace(output_parquet)
 
 
+# Enchaîne csv_to_parquet et snakemake_efficiency dans un seul processus (un seul démarrage de conteneur)
+def sacct_csv_to_snakemake_report(
+    input_csv: Path,
+    output_html: Path,
+    output_parquet: Path,
+    job_names: list[str],
+    input_sizes_csv: Path = None,
+    verbose: bool = False,
+    col_count: int = 109,
+    separator: str = "|",
+):
+    # Parquet 'raw' (schéma sacct), supprimé une fois le rapport généré
+    raw_parquet = output_parquet.with_suffix(".raw.parquet")
+    try:
+        save_to_parquet(input_csv, raw_parquet, verbose, col_count, separator)
+        generate_snakemake_efficiency_report(
+            output_html,
+            [str(raw_parquet)],
+            job_names,
+            output_parquet=output_parquet,
+            input_sizes_csv=input_sizes_csv,
+        )
+    finally:
+        raw_parquet.unlink(missing_ok=True)
+
+
 # CLI
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
@@ -724,7 +736,7 @@ def build_parser() -> argparse.ArgumentParser:
         "--input",
         dest="input_csv",
         type=Path,
-        help="Chemin du fichier CSV d'entrée",
+        help="Chemin du fichier CSV d'entrée ('-' pour lire l'entrée standard)",
     )
     p_csv.add_argument(
         "-o",
@@ -748,6 +760,13 @@ def build_parser() -> argparse.ArgumentParser:
         default="|",
         help="Séparateur utilisé dans le CSV (par défaut: |)",
     )
+    p_csv.add_argument(
+        "--no-sanitize",
+        dest="sanitize",
+        action="store_false",
+        help="Ne pas supprimer les lignes malformées avant la conversion (une seule passe sur le CSV, "
+        "mais ces lignes sont alors tronquées et leurs valeurs illisibles remplacées par des valeurs nulles)",
+    )
 
     # generic efficiency report
     p_generic = subparsers.add_parser(
@@ -815,6 +834,66 @@ def build_parser() -> argparse.ArgumentParser:
         type=Path,
     )
 
+    # csv -> parquet -> snakemake efficiency, dans un seul processus
+    p_pipeline = subparsers.add_parser(
+        "pipeline",
+        help="Enchaîner csv_to_parquet et snakemake_efficiency: à partir de la sortie de sacct (CSV), "
+        "générer directement le rapport HTML d'efficacité de Snakemake",
+    )
+    p_pipeline.set_defaults(func=sacct_csv_to_snakemake_report)
+    p_pipeline.add_argument(
+        "-i",
+        "--input",
+        dest="input_csv",
+        type=Path,
+        help="Chemin du fichier CSV d'entrée (sortie de sacct), '-' pour lire l'entrée standard",
+        required=True,
+    )
+    p_pipeline.add_argument(
+        "-o",
+        "--output",
+        dest="output_html",
+        type=Path,
+        help="Chemin du fichier html de sortie",
+        required=True,
+    )
+    p_pipeline.add_argument(
+        "--output-parquet",
+        help="Nom du fichier parquet où sauvegarder les données de performance consolidées pour les runs snakemake spécifiés",
+        type=Path,
+        required=True,
+    )
+    p_pipeline.add_argument(
+        "--job-names",
+        "-n",
+        dest="job_names",
+        help="Nom du(des) job(s) SLURM à sélectionner, séparés par des virgules",
+        type=lambda s: s.split(","),
+        required=True,
+    )
+    p_pipeline.add_argument(
+        "--sizes",
+        "-s",
+        dest="input_sizes_csv",
+        help="Nom du fichier contenant les tailles des fichiers d'entrée de snakemake",
+        type=Path,
+    )
+    p_pipeline.add_argument(
+        "--verbose", action="store_true", help="Afficher les informations détaillées"
+    )
+    p_pipeline.add_argument(
+        "--col-count",
+        type=int,
+        default=109,
+        help="Nombre attendu de colonnes dans le CSV (par défaut: 109)",
+    )
+    p_pipeline.add_argument(
+        "--separator",
+        type=str,
+        default="|",
+        help="Séparateur utilisé dans le CSV (par défaut: |)",
+    )
+
     return parser
 
 
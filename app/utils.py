@@ -1,5 +1,8 @@
-import polars as pl
+import glob
 from datetime import datetime, timedelta
+from pathlib import Path
+
+import polars as pl
 
 ALL_COLUMNS = [
     "Account",
@@ -213,6 +216,68 @@ INTERESTING_COLUMNS = [
     "WorkDir",
 ]
 
+# Types des colonnes de sacct (SLURM 22.05, 109 colonnes) lors de la conversion CSV -> parquet
+# Seules les colonnes qui ne sont pas du texte brut sont listées ici, toutes les autres sont des pl.String.
+# Les colonnes à faible cardinalité (comptes, QOS, états, noeuds...) sont stockées en pl.Categorical:
+# un dictionnaire de valeurs + des indices, plutôt qu'une chaîne par ligne
+SACCT_TYPES: dict[str, pl.DataType] = {
+    "Account": pl.Categorical,
+    "AllocCPUS": pl.Int64,
+    "AllocNodes": pl.Int64,
+    "AssocID": pl.Int64,
+    "AvePages": pl.Int64,
+    "ConsumedEnergy": pl.Int64,
+    "ConsumedEnergyRaw": pl.Int64,
+    "CPUTimeRAW": pl.Int64,
+    "DBIndex": pl.Int64,
+    "DerivedExitCode": pl.Categorical,
+    "ElapsedRaw": pl.Int64,
+    "ExitCode": pl.Categorical,
+    "Flags": pl.Categorical,
+    "GID": pl.Int64,
+    "Group": pl.Categorical,
+    "MaxDiskReadNode": pl.Categorical,
+    "MaxDiskReadTask": pl.Int64,
+    "MaxDiskWriteNode": pl.Categorical,
+    "MaxDiskWriteTask": pl.Int64,
+    "MaxPages": pl.Int64,
+    "MaxPagesNode": pl.Categorical,
+    "MaxPagesTask": pl.Int64,
+    "MaxRSSNode": pl.Categorical,
+    "MaxRSSTask": pl.Int64,
+    "MaxVMSizeNode": pl.Categorical,
+    "MaxVMSizeTask": pl.Int64,
+    "MinCPUNode": pl.Categorical,
+    "MinCPUTask": pl.Int64,
+    "NCPUS": pl.Int64,
+    "NNodes": pl.Int64,
+    "NTasks": pl.Int64,
+    "Partition": pl.Categorical,
+    "Priority": pl.Int64,
+    "QOS": pl.Categorical,
+    "QOSRAW": pl.Int64,
+    "ReqCPUS": pl.Int64,
+    "ReqNodes": pl.Int64,
+    "ResvCPURAW": pl.Int64,
+    "State": pl.Categorical,
+    "TRESUsageInMaxNode": pl.Categorical,
+    "TRESUsageInMinNode": pl.Categorical,
+    "TRESUsageOutMaxNode": pl.Categorical,
+    "TRESUsageOutMinNode": pl.Categorical,
+    "UID": pl.Int64,
+    "User": pl.Categorical,
+    "WCKeyID": pl.Int64,
+}
+
+SACCT_SCHEMA: dict[str, pl.DataType] = {
+    col_name: SACCT_TYPES.get(col_name, pl.String) for col_name in ALL_COLUMNS
+}
+
+# Détecte dès l'import une faute de frappe dans les listes de colonnes
+assert SACCT_TYPES.keys() <= SACCT_SCHEMA.keys()
+assert set(USEFUL_COLUMNS) <= SACCT_SCHEMA.keys()
+assert set(INTERESTING_COLUMNS) <= SACCT_SCHEMA.keys()
+
 
 DEFAULT_CMAP = [
     ((0, 20), "#ff0000"),
@@ -225,16 +290,98 @@ DEFAULT_CMAP = [
 
 COLOR_MAPS = {"default": DEFAULT_CMAP}
 
+# Colonnes horodatées de sacct, stockées au format pl.Datetime dans les fichiers parquet
+DATETIME_COLUMNS = ["Start", "End", "Submit"]
+# Format (fixe) des dates produites par sacct: le préciser évite à Polars de le deviner valeur par valeur
+SACCT_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def parse_datetime_cols(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Convertit en pl.Datetime les colonnes de DATETIME_COLUMNS encore au format texte.
+    Les colonnes déjà converties (fichiers parquet récents) sont laissées telles quelles,
+    ce qui évite de re-parser les dates à chaque utilisation.
+    Les valeurs non datées de sacct ('Unknown', 'None') deviennent nulles.
+    """
+    schema = lf.collect_schema()
+    return lf.with_columns(
+        pl.col(col_name).str.to_datetime(
+            format=SACCT_DATETIME_FORMAT, strict=False, exact=True
+        )
+        for col_name in DATETIME_COLUMNS
+        if schema.get(col_name) == pl.String
+    )
+
+
+# Multiplicateur (en bytes) associé à chaque unité de sacct
+KMG_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+# Convertit une colonne sacct de la forme <nombre><K|M|G|T> (ex: MaxRSS, ReqMem) en bytes
+# Une seule expression: pas de colonne intermédiaire `{colname}_unit` à matérialiser.
+# Le format étant fixe (nombre + une lettre), pas besoin d'expression régulière.
+# Un nombre sans unité (ex: '0', fréquent dans MaxRSS) est compté en bytes.
+# Le suffixe 'c' (par CPU) ou 'n' (par noeud) des anciennes versions de sacct (ex: '4000Mc') est ignoré.
+def parse_kmg_to_bytes(colname: str) -> pl.Expr:
+    value = pl.col(colname).str.strip_chars_end("cn")
+    return (
+        (
+            value.str.strip_chars_end("KMGTkmgt").cast(pl.Float64, strict=False)
+            * value.str.tail(1)
+            .str.to_uppercase()
+            .replace_strict(KMG_UNITS, default=1, return_dtype=pl.Int64)
+        )
+        .cast(pl.Int64)
+        .alias(colname)
+    )
+
+
+MEMORY_COLUMNS = ["MaxRSS", "ReqMem"]
+
+
+def parse_memory_cols(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Convertit en bytes (pl.Int64) les colonnes de MEMORY_COLUMNS encore au format texte (ex: '4000M').
+    Comme pour parse_datetime_cols, les colonnes déjà converties sont laissées telles quelles.
+    """
+    schema = lf.collect_schema()
+    return lf.with_columns(
+        parse_kmg_to_bytes(col_name)
+        for col_name in MEMORY_COLUMNS
+        if schema.get(col_name) == pl.String
+    )
+
+
+def scan_sacct_parquet(sources: str | Path | list[str | Path]) -> pl.LazyFrame:
+    """
+    Ouvre un ou plusieurs fichiers parquet de la base SACCT (chemins, dossiers ou wildcards).
+
+    Chaque fichier est ouvert séparément pour harmoniser les colonnes horodatées et mémoire:
+    les fichiers anciens (dates et mémoire au format texte) et récents (pl.Datetime, bytes)
+    peuvent ainsi être requêtés ensemble.
+    """
+    if isinstance(sources, (str, Path)):
+        sources = [sources]
+
+    files = []
+    for source in sources:
+        source = Path(source)
+        if source.is_dir():
+            files.extend(sorted(source.rglob("*.parquet")))
+        else:
+            files.extend(sorted(Path(p) for p in glob.glob(str(source))) or [source])
+
+    return pl.concat(
+        [parse_memory_cols(parse_datetime_cols(pl.scan_parquet(f))) for f in files],
+        how="diagonal_relaxed",
+    )
+
 
 def add_wait_time_cols(lf: pl.LazyFrame) -> pl.LazyFrame:
     # Ajoute une colonne wait_dt qui est un time delta représentant le temps d'attente entre soumission d'un job et son démarrage
     return (
-        lf.with_columns(
-            (
-                pl.col("Start").str.to_datetime(strict=False)
-                - pl.col("Submit").str.to_datetime(strict=False)
-            ).alias("wait_dt")
-        )
+        parse_datetime_cols(lf)
+        .with_columns((pl.col("Start") - pl.col("Submit")).alias("wait_dt"))
         .with_columns(
             pl.col("wait_dt").dt.total_seconds().alias("wait_time_seconds"),
             pl.col("wait_dt").dt.total_hours(fractional=True).alias("wait_time_hours"),
@@ -246,12 +393,8 @@ def add_wait_time_cols(lf: pl.LazyFrame) -> pl.LazyFrame:
 def add_job_duration_cols(lf: pl.LazyFrame) -> pl.LazyFrame:
     # Ajoute une colonne wait_dt qui est un time delta représentant le temps d'attente entre soumission d'un job et son démarrage
     return (
-        lf.with_columns(
-            (
-                pl.col("End").str.to_datetime(strict=False)
-                - pl.col("Start").str.to_datetime(strict=False)
-            ).alias("duration_dt")
-        )
+        parse_datetime_cols(lf)
+        .with_columns((pl.col("End") - pl.col("Start")).alias("duration_dt"))
         .with_columns(
             pl.col("duration_dt").dt.total_seconds().alias("job_duration_seconds"),
         )
@@ -266,7 +409,8 @@ def add_daily_duration(lazyframe: pl.LazyFrame, date: str) -> pl.LazyFrame:
     Ajoute également une colonne avec la date demandée
 
     Args:
-        lazyframe: LazyFrame Polars contenant les données sacct (avec les colonnes 'Start' et 'End')
+        lazyframe: LazyFrame Polars contenant les données sacct (avec les colonnes 'Start' et 'End',
+            au format datetime ou texte)
         date: Date cible au format 'YYYY-MM-DD' (string ou objet date)
 
     Returns:
@@ -291,52 +435,27 @@ def add_daily_duration(lazyframe: pl.LazyFrame, date: str) -> pl.LazyFrame:
     day_end = datetime.combine(target_date + timedelta(days=1), datetime.min.time())
 
     # Expressions Polars pour calculer la durée quotidienne
-    # Convertir Start et End en datetime
-    start_dt = pl.col("Start").str.to_datetime(strict=False)
-    end_dt = pl.col("End").str.to_datetime(strict=False)
+    # Start et End sont déjà au format datetime dans les fichiers parquet récents
+    lazyframe = parse_datetime_cols(lazyframe)
+    start_dt = pl.col("Start")
+    end_dt = pl.col("End")
 
     # Créer les constantes pour les comparaisons
     day_start_dt = pl.lit(day_start)
     day_end_dt = pl.lit(day_end)
 
-    # Calculer la durée selon les cas:
-    # 1. Job started et terminé le même jour (jour ciblé)
-    same_day = (start_dt.dt.date() == target_date) & (end_dt.dt.date() == target_date)
-    duration_same_day = (end_dt - start_dt).dt.total_seconds() / 3600
-
-    # 2. Job a démarré avant le jour ciblé, terminé ce jour
-    started_before = start_dt < day_start_dt
-    ended_on_day = end_dt.dt.date() == target_date
-    case_started_before = started_before & ended_on_day
-    duration_started_before = (end_dt - day_start_dt).dt.total_seconds() / 3600
-
-    # 3. Job a démarré ce jour, terminé après
-    started_on_day = start_dt.dt.date() == target_date
-    ended_after = end_dt >= day_end_dt
-    case_ended_after = started_on_day & ended_after
-    duration_ended_after = (day_end_dt - start_dt).dt.total_seconds() / 3600
-
-    # 4. Job a spané plusieurs jours (a commencé avant et terminé après)
-    spanning = started_before & ended_after
-    duration_spanning = pl.lit(24.0)
-
-    # 5. Job n'a pas du tout tournée ce jour (hors période)
-    # Cela sera traité comme défaut (0 heures)
-
-    # Combiner les cas avec when/then/otherwise
+    # Tous les cas (même jour, veille, lendemain, plusieurs jours, hors période) se traitent
+    # en bornant Start et End à la journée ciblée: la durée est alors leur différence
+    clipped_start = start_dt.clip(day_start_dt, day_end_dt)
+    clipped_end = end_dt.clip(day_start_dt, day_end_dt)
     daily_duration = (
-        pl.when(same_day)
-        .then(duration_same_day)
-        .when(case_started_before)
-        .then(duration_started_before)
-        .when(case_ended_after)
-        .then(duration_ended_after)
-        .when(spanning)
-        .then(duration_spanning)
-        .otherwise(0.0)
+        ((clipped_end - clipped_start).dt.total_seconds() / 3600)
+        .clip(lower_bound=0.0)
+        # Jobs sans date de début ou de fin (en attente, en cours): 0 heures
+        .fill_null(0.0)
         .alias("daily_duration_hours")
     )
 
-    date_col = pl.lit(date).str.to_date("%Y-%m-%d") if isinstance(date, str) else date
+    date_col = pl.lit(target_date)
 
     return lazyframe.with_columns(daily_duration, date_col.alias("date"))
@@ -1,16 +1,67 @@
 #!/usr/bin/env python
 
+import atexit
+import hashlib
+import os
+import re
+import shutil
 import subprocess
+import sys
+import time
 from pathlib import Path
 import argparse
 
+# Nom des logs de snakemake: .snakemake/log/<YYYY-MM-DD>T<HHMMSS>.<microsecondes>.snakemake.log
+SNAKEMAKE_LOG_DATE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})T\d{6}\..+\.snakemake\.log$")
+
+# Séparateur des champs de sacct: un caractère de contrôle (unit separator) qui, contrairement à '|',
+# ne peut pas apparaître dans un champ texte (ex: Comment, JobName)
+SACCT_DELIMITER = "\x1f"
+
+# Colonnes de sacct utilisées par le rapport d'efficacité snakemake (plutôt que les 109 colonnes de `-o ALL`)
+SACCT_FIELDS = [
+    "JobID",
+    "JobName",
+    "Comment",
+    "User",
+    "Account",
+    "Partition",
+    "QOS",
+    "State",
+    "ExitCode",
+    "Submit",
+    "Start",
+    "End",
+    "Elapsed",
+    "ElapsedRaw",
+    "CPUTime",
+    "CPUTimeRAW",
+    "TotalCPU",
+    "ReqCPUS",
+    "AllocCPUS",
+    "ReqMem",
+    "MaxRSS",
+    "MaxVMSize",
+    "NodeList",
+]
+
+# Cache des sorties de extract_snakemake_logs.py (tailles des fichiers d'entrée et noms des jobs), par empreinte des logs et de l'image
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "slurm-usage-report"
+)
+# Les entrées du cache inutilisées depuis plus de CACHE_MAX_AGE_DAYS jours sont supprimées
+# à chaque nouvelle entrée. Pour vider le cache: supprimer le dossier CACHE_DIR
+CACHE_MAX_AGE_DAYS = 30
+
+
 if __name__ == "__main__":
 
     # Fichiers requis:
     # - Un fichier de log de snakemake (ex: .snakemake/log/xxx.log) pour extraire le SLURM job id
     # - Optionnellement, une base de données SACCT maison (dossier avec des fichiers parquet, les colonnes sont celles de sacct SLURM 22.05, soit 109 au total)
     # Fichiers produits:
-    # - Un fichier parquet avec les données SACCT pour les jobs SLURM extraits
+    # - Un fichier parquet avec les données SACCT pour les jobs SLURM extraits (sans base de données, seules les colonnes de SACCT_FIELDS sont demandées à sacct)
     # - Un fichier HTML avec le rapport d'efficacité de snakemake (temps CPU utilisé / temps CPU demandé) par règle snakemake, pour les jobs extraits
     # - Un fichier CSV avec la taille totale des fichiers d'entrée par job SLURM, pour les jobs extraits
     # Les trois fichiers produits seront nommés à partir du nom du fichier parquet intermédiaire,
@@ -47,6 +98,13 @@ if __name__ == "__main__":
         help="Chemin absolu vers l'image singularity à utiliser pour exécuter l'application",
         default="/SINGULARITIES/slurm-usage-report-1.0.0.sif",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Régénère les rapports même s'ils sont plus récents que les logs de Snakemake. "
+        f"Les noms de jobs et tailles des fichiers d'entrée restent lus depuis le cache ({CACHE_DIR}): "
+        "supprimer ce dossier pour les recalculer",
+    )
     args = parser.parse_args()
 
     log_paths = [Path(p).resolve().absolute() for p in args.log_paths]
@@ -55,93 +113,165 @@ if __name__ == "__main__":
     output_html = output_parquet.with_suffix(".html")
     output_input_sizes = output_parquet.with_suffix(".input-sizes.csv")
 
+    for log_path in log_paths:
+        if not log_path.exists():
+            print(f"Fichier de log introuvable: {log_path}", file=sys.stderr)
+            sys.exit(2)
+
+    # Rapports déjà générés après la dernière modification des logs (ex: hook post-run relancé): rien à refaire
+    log_mtime = max(log_path.stat().st_mtime for log_path in log_paths)
+    if (
+        not args.force
+        and output_parquet.exists()
+        and output_html.exists()
+        and min(output_parquet.stat().st_mtime, output_html.stat().st_mtime) > log_mtime
+    ):
+        print(
+            f"Rapports à jour ({output_parquet}, {output_html}), utilisez --force pour les régénérer"
+        )
+        sys.exit(0)
+
     singularity_image = args.singularity_image
 
-    # 0: Obtenir le SLURM job id depuis le log de snakemake (il y a une ligne dédiée pour ça)
-    slurm_job_names = subprocess.check_output(
+    # Une seule instance du conteneur, démarrée ici puis réutilisée par chaque `singularity exec`:
+    # l'image n'est montée qu'une fois. L'instance est arrêtée à la fin du script, même en cas d'erreur
+    instance_name = f"slurm-usage-report-{os.getpid()}"
+    subprocess.run(
         [
             "singularity",
-            "exec",
+            "instance",
+            "start",
+            "-B",
+            "/tmp",
             singularity_image,
-            "/app/extract_snakemake_logs.py",
-            "-i",
-            *log_paths,
-            "-o",
-            output_input_sizes,  # Permet ensuite de rapporter les métriques de run à la taille des fichiers
+            instance_name,
         ],
-        text=True,
-    ).splitlines()
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    atexit.register(
+        subprocess.run,
+        ["singularity", "instance", "stop", instance_name],
+        stdout=subprocess.DEVNULL,
+    )
+    container = f"instance://{instance_name}"
+
+    # 0: Obtenir le SLURM job id depuis le log de snakemake (il y a une ligne dédiée pour ça)
+    # Le résultat est mis en cache, avec pour clé l'empreinte des logs: si le post-run est relancé
+    # sur les mêmes logs, les tailles des fichiers d'entrée ne sont pas recalculées.
+    # L'image singularity (chemin et date de modification) fait partie de la clé: après une mise à jour
+    # de l'image (donc de extract_snakemake_logs.py), le cache n'est pas réutilisé
+    log_hash = hashlib.sha256()
+    log_hash.update(
+        f"{singularity_image}:{Path(singularity_image).stat().st_mtime_ns}".encode()
+    )
+    for log_path in log_paths:
+        log_hash.update(str(log_path).encode())
+        log_hash.update(log_path.read_bytes())
+    cache_key = log_hash.hexdigest()[:16]
+    cached_input_sizes = CACHE_DIR / f"{cache_key}.input-sizes.csv"
+    cached_job_names = CACHE_DIR / f"{cache_key}.names"
+
+    if cached_input_sizes.exists() and cached_job_names.exists():
+        shutil.copyfile(cached_input_sizes, output_input_sizes)
+        slurm_job_names = cached_job_names.read_text().splitlines()
+        # Date de dernière utilisation, pour le nettoyage du cache
+        cached_input_sizes.touch()
+        cached_job_names.touch()
+    else:
+        slurm_job_names = subprocess.check_output(
+            [
+                "singularity",
+                "exec",
+                container,
+                "/app/extract_snakemake_logs.py",
+                "-i",
+                *log_paths,
+                "-o",
+                output_input_sizes,  # Permet ensuite de rapporter les métriques de run à la taille des fichiers
+            ],
+            text=True,
+        ).splitlines()
+        # Les noms sont écrits en dernier: le cache n'est utilisé que s'il est complet
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(output_input_sizes, cached_input_sizes)
+        cached_job_names.write_text("".join(f"{name}\n" for name in slurm_job_names))
+
+        # Nettoyage du cache: le dossier ne grossit pas indéfiniment
+        max_mtime = time.time() - CACHE_MAX_AGE_DAYS * 24 * 3600
+        for cached_file in CACHE_DIR.iterdir():
+            try:
+                if cached_file.stat().st_mtime < max_mtime:
+                    cached_file.unlink()
+            except FileNotFoundError:
+                # Déjà supprimé par un autre post-run lancé en même temps
+                pass
+
+    # Aucun job SLURM dans les logs (ex: run exécuté localement): rien à demander à sacct, pas de rapport
+    if not slurm_job_names:
+        print(
+            "Aucun job SLURM trouvé dans les logs de Snakemake, pas de rapport généré"
+        )
+        sys.exit(0)
+
+    # Date de début pour sacct: celle du plus ancien log (les jobs d'un run sont soumis après la création de son log).
+    # Si la date d'un des logs est inconnue, tous les jobs sont recherchés, même ceux lancés il y a longtemps
+    log_dates = [SNAKEMAKE_LOG_DATE_RE.match(log_path.name) for log_path in log_paths]
+    if all(log_dates):
+        sacct_start = min(log_date.group(1) for log_date in log_dates)
+    else:
+        sacct_start = "1970-01-01"
 
     if not args.database:
-        output_csv = output_parquet.with_suffix(".csv")
-        output_raw_parquet = output_parquet.with_suffix(".raw.parquet")
         try:
             # Etapes 1 et 2: obtenir le rapport SACCT au format parquet
-            # 1: Obtenir le rapport sacct pour le job_id
-            with open(
-                output_csv,
-                "w",
-            ) as report_file:
+            # 1: Obtenir le rapport sacct pour le job_id. Sa sortie est envoyée directement (par un pipe)
+            # à l'étape suivante, sans passer par un fichier CSV intermédiaire
+            with subprocess.Popen(
+                [
+                    "sacct",
+                    "-S",
+                    sacct_start,
+                    "-a",
+                    "--name",
+                    ",".join(slurm_job_names),
+                    "-o",
+                    ",".join(SACCT_FIELDS),
+                    "-P",
+                    f"--delimiter={SACCT_DELIMITER}",
+                ],
+                stdout=subprocess.PIPE,
+            ) as sacct:
+                # Etapes 2 et 3, dans un seul conteneur: convertir le CSV en parquet (le schéma de celui-ci est dit 'raw',
+                # il vient directement de sacct), puis obtenir le rapport d'efficacité snakemake à partir de ce parquet
                 subprocess.run(
                     [
-                        "sacct",
-                        "-S",
-                        "1970-01-01",  # pour être sûr d'avoir tous les jobs, même ceux qui ont été lancés il y a longtemps
-                        "-a",
-                        "--name",
-                        ",".join(slurm_job_names),
+                        "singularity",
+                        "exec",
+                        container,
+                        "/app/usage_report.py",
+                        "pipeline",
+                        "-i",
+                        "-",  # Lit la sortie de sacct sur l'entrée standard
+                        "--col-count",
+                        str(len(SACCT_FIELDS)),
+                        "--separator",
+                        SACCT_DELIMITER,
                         "-o",
-                        "ALL",
-                        "-P",
+                        output_html,
+                        "-n",
+                        ",".join(slurm_job_names),
+                        "-s",
+                        output_input_sizes,
+                        "--output-parquet",
+                        output_parquet,
                     ],
-                    stdout=report_file,
+                    stdin=sacct.stdout,
                     text=True,
                     check=True,
                 )
-            # 2: convertir les CSV en parquet (plus rapide pour les requêtes). Le schéma de celui-ci est dit 'raw' (vient directement de sacct)
-            subprocess.run(
-                [
-                    "singularity",
-                    "exec",
-                    "-B",
-                    "/tmp",
-                    singularity_image,
-                    "/app/usage_report.py",
-                    "csv_to_parquet",
-                    "-i",
-                    output_csv,
-                    "-o",
-                    output_raw_parquet,
-                ],
-                text=True,
-                check=True,
-            )
-            # Etape 3: A partir du fichier parquet obtenu aux étapes précédentes, obtenir le rapport d'efficacité snakemake
-            subprocess.run(
-                [
-                    "singularity",
-                    "exec",
-                    "-B",
-                    "/tmp",
-                    singularity_image,
-                    "/app/usage_report.py",
-                    "snakemake_efficiency",
-                    "-i",
-                    output_raw_parquet,
-                    "-o",
-                    output_html,
-                    "-s",
-                    output_input_sizes,
-                    "--output-parquet",
-                    output_parquet,
-                ],
-                text=True,
-                check=True,
-            )
-            if output_raw_parquet.exists():
-                output_raw_parquet.unlink()
-            if output_csv.exists():
-                output_csv.unlink()
+            if sacct.returncode != 0:
+                raise subprocess.CalledProcessError(sacct.returncode, sacct.args)
 
         except subprocess.CalledProcessError as e:
             print(f"Une erreur est survenue: {e}")
@@ -152,9 +282,7 @@ if __name__ == "__main__":
             [
                 "singularity",
                 "exec",
-                "-B",
-                "/tmp",
-                singularity_image,
+                container,
                 "/app/usage_report.py",
                 "snakemake_efficiency",
                 "-i",